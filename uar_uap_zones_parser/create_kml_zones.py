@@ -1,12 +1,27 @@
 import json
 import re
+import sys
 import simplekml
 import math
+import numpy as np
+from functools import lru_cache
+from concurrent.futures import ProcessPoolExecutor
 
+# Cyrillic 'Е' often appears instead of Latin 'E' in the source tables
+_TRANS = str.maketrans({'Е': 'E'})
+
+# Precompiled patterns used for every zone
+# ASCII-only digits so matches can be packed into a byte buffer
+_REV_RE = re.compile(r'(\d{6})([NS])[ \-]?(\d{7})([EW])', re.ASCII)
+_STD_RE = re.compile(r'([NS])[ \-]?(\d{6})[ \-,]*([EW])[ \-]?(\d{7})', re.ASCII)
+_RADIUS_RE = re.compile(r'R[=-](\d+)')
+
+@lru_cache(maxsize=65536)
 def parse_dms(dms_str):
     """
     Parse a DMS string into decimal degrees.
     Examples: 'N433604', 'E0713936', etc.
+    Results are cached, since zones often share the same points.
     """
     # Clean up the input, removing any spaces
     dms_str = dms_str.strip()
@@ -52,33 +67,89 @@ def parse_dms(dms_str):
     
     return dec
 
+def parse_dms_batch(values, directions, width):
+    """
+    Parse many fixed-width DMS values into decimal degrees at once.
+    values: digit strings like '433604' (width 6) or '0713936' (width 7)
+    directions: matching 'N', 'S', 'E' or 'W' letters
+    Returns a NumPy array of decimal degrees.
+    """
+    # Pack all digits into one contiguous buffer, one row per value
+    digits = np.frombuffer(''.join(values).encode('ascii'), dtype=np.uint8)
+    digits = (digits.reshape(-1, width) - ord('0')).astype(np.float64)
+    
+    # Degrees take the leading 2 or 3 digits, then MM and SS
+    deg_width = width - 4
+    d = digits[:, :deg_width] @ (10.0 ** np.arange(deg_width - 1, -1, -1))
+    m = digits[:, -4] * 10 + digits[:, -3]
+    s = digits[:, -2] * 10 + digits[:, -1]
+    
+    # Convert to decimal degrees
+    dec = d + m/60 + s/3600
+    
+    # Apply sign based on direction
+    negative = np.isin(directions, ['S', 'W'])
+    return np.where(negative, -dec, dec)
+
+# Below this many vertices NumPy call overhead outweighs the batched conversion
+_BATCH_MIN_VERTICES = 50
+
+def parse_vertices(lat_vals, lat_dirs, lon_vals, lon_dirs):
+    """
+    Convert matched polygon vertices into an (N, 2) array of (lon, lat) rows.
+    Small polygons go through parse_dms, large ones through parse_dms_batch.
+    """
+    if len(lat_vals) < _BATCH_MIN_VERTICES:
+        return np.array([
+            (parse_dms(f"{lon_dir}{lon_val}"), parse_dms(f"{lat_dir}{lat_val}"))
+            for lat_val, lat_dir, lon_val, lon_dir in zip(lat_vals, lat_dirs, lon_vals, lon_dirs)
+        ])
+    
+    lats = parse_dms_batch(lat_vals, lat_dirs, 6)
+    lons = parse_dms_batch(lon_vals, lon_dirs, 7)
+    return np.column_stack((lons, lats))  # KML expects (lon, lat)
+
+# Unit circle (sin, cos) tables keyed by the number of points, shared by all circle zones
+_CIRCLE_TABLE = {}
+
+def _unit_circle(num_points):
+    """
+    Return cached (sin, cos) arrays for num_points + 1 angles around the circle.
+    """
+    table = _CIRCLE_TABLE.get(num_points)
+    if table is None:
+        angles = np.linspace(0, 2 * np.pi, num_points + 1)  # +1 to close the circle
+        table = (np.sin(angles), np.cos(angles))
+        for values in table:
+            values.flags.writeable = False
+        _CIRCLE_TABLE[num_points] = table
+    return table
+
 def create_circle_polygon(center_lat, center_lon, radius_meters, num_points=36):
     """
     Create a circular polygon based on center and radius.
-    Returns a list of (lon, lat) tuples for KML.
+    Returns an (N, 2) array of (lon, lat) rows for KML.
     """
     # Constants for Earth radius
     EARTH_RADIUS = 6378137  # meters at equator
     
     # Convert radius from meters to degrees (approximate)
     radius_deg_lat = (radius_meters / EARTH_RADIUS) * (180 / math.pi)
-    radius_deg_lon = radius_deg_lat / math.cos(math.radians(center_lat))
+    cos_lat = math.cos(math.radians(center_lat))
+    radius_deg_lon = radius_deg_lat / cos_lat
     
-    # Generate points around the circle
-    points = []
-    for i in range(num_points + 1):  # +1 to close the circle
-        angle = 2 * math.pi * i / num_points
-        lat = center_lat + radius_deg_lat * math.sin(angle)
-        lon = center_lon + radius_deg_lon * math.cos(angle)
-        points.append((lon, lat))  # KML expects (lon, lat)
+    # Generate all points around the circle at once from the shared unit circle
+    sin_table, cos_table = _unit_circle(num_points)
+    lats = center_lat + radius_deg_lat * sin_table
+    lons = center_lon + radius_deg_lon * cos_table
     
-    return points
+    return np.column_stack((lons, lats))  # KML expects (lon, lat)
 
 def extract_radius(radius_str):
     """
     Extract radius value in meters from string like "R=5000 м"
     """
-    match = re.search(r'R[=-](\d+)', radius_str)
+    match = _RADIUS_RE.search(radius_str)
     if match:
         return int(match.group(1))
     return 5000  # Default radius if not found
@@ -87,12 +158,10 @@ def get_coords(coord_str):
     """
     Parse coordinates from the zone definition string.
     Handles both polygon and circle formats.
+    Returns an (N, 2) array of (lon, lat) rows, empty if nothing was found.
     """
-    # Replace Cyrillic 'Е' with Latin 'E' if present
-    coord_str = coord_str.replace('Е', 'E')
-    
-    # Remove extra spaces for easier parsing
-    coord_str = re.sub(r'\s+', ' ', coord_str.strip())
+    # Replace Cyrillic 'Е' with Latin 'E' and remove extra spaces for easier parsing
+    coord_str = ' '.join(coord_str.translate(_TRANS).split())
     
     # Check for circle format
     circle_format = False
@@ -103,7 +172,7 @@ def get_coords(coord_str):
         radius = extract_radius(coord_str)
     
     # Check for the reversed format pattern (e.g., "460755N 0805610E")
-    reversed_format = re.findall(r'(\d{6})([NS])[ \-]?(\d{7})([EW])', coord_str)
+    reversed_format = _REV_RE.findall(coord_str)
     if reversed_format:
         if circle_format:
             # Only use the first coordinate pair as center for circle
@@ -113,20 +182,17 @@ def get_coords(coord_str):
             return create_circle_polygon(lat, lon, radius)
         else:
             # Process as polygon
-            coords = []
-            for lat_val, lat_dir, lon_val, lon_dir in reversed_format:
-                lat = parse_dms(f"{lat_dir}{lat_val}")
-                lon = parse_dms(f"{lon_dir}{lon_val}")
-                coords.append((lon, lat))  # KML expects (lon, lat)
+            lat_vals, lat_dirs, lon_vals, lon_dirs = zip(*reversed_format)
+            coords = parse_vertices(lat_vals, lat_dirs, lon_vals, lon_dirs)
             
             # Make sure the polygon is closed
-            if coords and coords[0] != coords[-1]:
-                coords.append(coords[0])
+            if not np.array_equal(coords[0], coords[-1]):
+                coords = np.vstack((coords, coords[:1]))
                 
             return coords
     
     # Standard format (e.g., "N433604 E0765618")
-    pairs = re.findall(r'([NS])[ \-]?(\d{6})[ \-,]*([EW])[ \-]?(\d{7})', coord_str)
+    pairs = _STD_RE.findall(coord_str)
     
     if pairs:
         if circle_format:
@@ -137,21 +203,50 @@ def get_coords(coord_str):
             return create_circle_polygon(lat, lon, radius)
         else:
             # Process as polygon
-            coords = []
-            for lat_dir, lat_val, lon_dir, lon_val in pairs:
-                lat = parse_dms(f"{lat_dir}{lat_val}")
-                lon = parse_dms(f"{lon_dir}{lon_val}")
-                coords.append((lon, lat))  # KML expects (lon, lat)
+            lat_dirs, lat_vals, lon_dirs, lon_vals = zip(*pairs)
+            coords = parse_vertices(lat_vals, lat_dirs, lon_vals, lon_dirs)
             
             # Make sure the polygon is closed
-            if coords and coords[0] != coords[-1]:
-                coords.append(coords[0])
+            if not np.array_equal(coords[0], coords[-1]):
+                coords = np.vstack((coords, coords[:1]))
                 
             return coords
     
-    return []
+    return np.empty((0, 2))
+
+def parse_zone(zone):
+    """
+    Parse a single zone record from zones.json.
+    Returns (name, coord_str, coords, description), or None if the zone is skipped.
+    coords is empty if the coordinates could not be parsed.
+    """
+    # Skip excluded zones
+    if "Исключена приказом" in zone.get('1', ''):
+        return None
+        
+    name = zone.get('1', '')
+    coord_str = zone.get('2', '')
+    alt_range = zone.get('3', '')
+    alt_limit = zone.get('4', '')
+    schedule = zone.get('5', '')
+
+    if not name or not coord_str:
+        return None
+        
+    # Get coordinates - KML expects (lon, lat) pairs
+    coords = get_coords(coord_str)
+
+    # Set description with zone information
+    description = f"Altitude: {alt_range}\nLimit: {alt_limit}\nSchedule: {schedule}"
+    
+    return name, coord_str, coords, description
 
-def main():
+def main(workers=1):
+    """
+    Build zones.kml from zones.json.
+    workers: number of processes used to parse zones; with the default of 1
+    zones are parsed sequentially in the current process.
+    """
     # Load zones data
     with open('zones.json', 'r', encoding='utf-8') as f:
         zones = json.load(f)
@@ -169,32 +264,28 @@ def main():
     successful_zones = 0
     failed_zones = 0
     
-    for zone in zones:
-        # Skip excluded zones
-        if "Исключена приказом" in zone.get('1', ''):
-            continue
-            
-        name = zone.get('1', '')
-        coord_str = zone.get('2', '')
-        alt_range = zone.get('3', '')
-        alt_limit = zone.get('4', '')
-        schedule = zone.get('5', '')
-
-        if not name or not coord_str:
+    # Each zone is independent, so parsing can optionally run in several processes
+    # (the pool startup only pays off for large inputs)
+    if workers > 1:
+        chunksize = max(1, len(zones) // (workers * 4))
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            parsed_zones = list(executor.map(parse_zone, zones, chunksize=chunksize))
+    else:
+        parsed_zones = list(map(parse_zone, zones))
+    
+    # Assemble the KML document sequentially (simplekml is not process-safe)
+    for parsed_zone in parsed_zones:
+        if parsed_zone is None:
             continue
-            
-        # Get coordinates - KML expects (lon, lat) pairs
-        coords = get_coords(coord_str)
-        if not coords:
+        
+        name, coord_str, coords, description = parsed_zone
+        if len(coords) == 0:
             print(f"Failed to parse coordinates for zone {name}: {coord_str}")
             failed_zones += 1
             continue
 
-        # Set description with zone information
-        description = f"Altitude: {alt_range}\nLimit: {alt_limit}\nSchedule: {schedule}"
-
         # Create polygon with the appropriate style
-        poly = kml.newpolygon(name=name, outerboundaryis=coords, description=description)
+        poly = kml.newpolygon(name=name, outerboundaryis=coords.tolist(), description=description)
         poly.style = zone_style
         
         successful_zones += 1
@@ -204,8 +295,11 @@ def main():
     print(f"KML file generated successfully - {successful_zones} zones processed, {failed_zones} zones failed")
 
 if __name__ == "__main__":
-    main()
+    # Optional first argument: number of worker processes (default 1, no pool)
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1)
 
 # Usage:
 # Place this script alongside your 'zones.json' file and run:
 # python create_kml_zones.py
+# To parse zones in several processes (pays off only for large inputs):
+# python create_kml_zones.py 4
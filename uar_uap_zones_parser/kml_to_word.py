@@ -1,11 +1,43 @@
-import xml.etree.ElementTree as ET
-import math
+from lxml import etree
 import re
+import numpy as np
 from docx import Document
 from docx.shared import Pt, Inches, RGBColor
 from docx.enum.text import WD_ALIGN_PARAGRAPH
 from docx.enum.table import WD_ALIGN_VERTICAL
+from docx.oxml import parse_xml
+from docx.oxml.ns import nsdecls, qn
 import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+# Полные имена тегов и пути KML (без разбора префиксов при каждом поиске)
+KML_NS = '{http://www.opengis.net/kml/2.2}'
+PLACEMARK = KML_NS + 'Placemark'
+FOLDER = KML_NS + 'Folder'
+NAME = KML_NS + 'name'
+POLYGON_COORDS = (f'.//{KML_NS}Polygon/{KML_NS}outerBoundaryIs/'
+                  f'{KML_NS}LinearRing/{KML_NS}coordinates')
+LINESTRING_COORDS = f'.//{KML_NS}LineString/{KML_NS}coordinates'
+
+# Символы чисел в строке координат; после их удаления остаются только разделители
+NUMBER_CHARS = b'0123456789.+-eE'
+
+# Шаблон строки таблицы координат: для каждой из трех ячеек ширина и текст,
+# текст выровнен по центру
+COORD_CELL_XML = (
+    '<w:tc><w:tcPr><w:tcW w:type="dxa" w:w="{}"/></w:tcPr>'
+    '<w:p><w:pPr><w:jc w:val="center"/></w:pPr><w:r><w:t>{}</w:t></w:r></w:p></w:tc>'
+)
+COORD_ROW_XML = '<w:tr>' + COORD_CELL_XML * 3 + '</w:tr>'
+
+# Шаблон заголовка таблицы координат: то же, но текст жирный
+COORD_HEADER_CELL_XML = (
+    '<w:tc><w:tcPr><w:tcW w:type="dxa" w:w="{}"/></w:tcPr>'
+    '<w:p><w:pPr><w:jc w:val="center"/></w:pPr>'
+    '<w:r><w:rPr><w:b/></w:rPr><w:t>{}</w:t></w:r></w:p></w:tc>'
+)
+COORD_HEADER_XML = '<w:tr>' + COORD_HEADER_CELL_XML * 3 + '</w:tr>'
 
 def decimal_to_dms(decimal, is_latitude=True):
     """
@@ -29,6 +61,50 @@ def decimal_to_dms(decimal, is_latitude=True):
         direction = "E" if is_positive else "W"
         return f"{direction}{degrees:03d}{minutes:02d}{seconds:02d}"
 
+def parse_coordinates(coordinates_text):
+    """
+    Преобразует строку координат KML ("lon,lat[,alt] ...") в массив (N, 3)
+    вида (lon, lat, alt); отсутствующая высота считается равной 0
+    """
+    # Быстрый путь только для строк, где все точки записаны одинаково:
+    # у каждой точки остаются разделители ",," (lon,lat,alt) или "," (lon,lat).
+    # Точки без запятых пропадают из separators, поэтому сверяем их число с числом точек
+    point_count = len(coordinates_text.split())
+    separators = coordinates_text.encode('ascii', 'replace').translate(None, NUMBER_CHARS).split()
+    structure = set(separators) if len(separators) == point_count else None
+    if structure == {b',,'}:
+        width = 3
+    elif structure == {b','}:
+        width = 2
+    else:
+        width = None
+    
+    if width is not None:
+        # Разбираем все числа строки за один вызов; на некорректных числах
+        # np.fromstring выбрасывает ValueError, тогда разбираем точки по одной
+        try:
+            flat = np.fromstring(coordinates_text.replace(',', ' '), dtype=np.float64, sep=' ')
+        except ValueError:
+            flat = None
+        
+        if flat is not None and len(flat) == width * point_count:
+            if width == 3:
+                return flat.reshape(-1, 3)
+            coordinates = np.zeros((point_count, 3))
+            coordinates[:, :width] = flat.reshape(-1, width)
+            return coordinates
+    
+    # Смешанный формат: разбираем каждую точку отдельно
+    coordinates = []
+    for coord_str in coordinates_text.split():
+        parts = coord_str.split(',')
+        if len(parts) >= 2:
+            lon = float(parts[0])
+            lat = float(parts[1])
+            alt = float(parts[2]) if len(parts) > 2 else 0
+            coordinates.append((lon, lat, alt))
+    return np.array(coordinates, dtype=np.float64).reshape(-1, 3)
+
 def analyze_shape(coordinates, shape_type_hint=None):
     """
     Анализирует форму на основе координат
@@ -43,50 +119,47 @@ def analyze_shape(coordinates, shape_type_hint=None):
     # Специальный случай: LineString с более чем 50 точками почти всегда круг
     # (как Ханшатыр и Флаг в примере)
     if len(coordinates) > 50 and shape_type_hint == "line":
-        # Проверяем, замкнута ли линия (начало и конец совпадают)
-        is_closed = (math.sqrt((coordinates[0][0] - coordinates[-1][0])**2 + 
-                              (coordinates[0][1] - coordinates[-1][1])**2) < 0.0001)
+        # Проверяем, замкнута ли линия (начало и конец совпадают);
+        # сравниваем квадрат расстояния, чтобы не брать корень
+        dx = coordinates[0][0] - coordinates[-1][0]
+        dy = coordinates[0][1] - coordinates[-1][1]
+        is_closed = dx*dx + dy*dy < 1e-8
         
         if is_closed:
             # Находим центр и радиус
-            center_lon = sum(coord[0] for coord in coordinates) / len(coordinates)
-            center_lat = sum(coord[1] for coord in coordinates) / len(coordinates)
+            points = np.asarray(coordinates, dtype=np.float64)[:, :2]
+            center_lon, center_lat = points.mean(axis=0)
             
             # Вычисляем среднее расстояние до центра (радиус)
-            distances = []
-            for lon, lat, _ in coordinates:
-                distance = math.sqrt((lon - center_lon)**2 + (lat - center_lat)**2)
-                distances.append(distance)
-            
-            avg_distance = sum(distances) / len(distances)
+            distances = np.hypot(points[:, 0] - center_lon, points[:, 1] - center_lat)
+            avg_distance = distances.mean()
             radius_meters = avg_distance * 111000  # примерно метров в градусе
             
             # Для таких случаев как Ханшатыр и Флаг возвращаем круг
             return "circle", (center_lat, center_lon, radius_meters)
     
     # Проверка замкнутости фигуры (первая и последняя точки совпадают)
-    is_closed = (math.sqrt((coordinates[0][0] - coordinates[-1][0])**2 + 
-                          (coordinates[0][1] - coordinates[-1][1])**2) < 0.0001)
-    
-    # Находим центр многоугольника (центр тяжести)
-    center_lon = sum(coord[0] for coord in coordinates) / len(coordinates)
-    center_lat = sum(coord[1] for coord in coordinates) / len(coordinates)
+    dx = coordinates[0][0] - coordinates[-1][0]
+    dy = coordinates[0][1] - coordinates[-1][1]
+    is_closed = dx*dx + dy*dy < 1e-8
     
-    # Вычисляем расстояние от центра до каждой точки
-    distances = []
-    for lon, lat, _ in coordinates:
-        distance = math.sqrt((lon - center_lon)**2 + (lat - center_lat)**2)
-        distances.append(distance)
-    
-    # Если все расстояния примерно одинаковые, то фигура похожа на круг
-    avg_distance = sum(distances) / len(distances)
-    distance_variance = sum((d - avg_distance)**2 for d in distances) / len(distances)
-    
-    # Относительная дисперсия (отклонение / среднее)
-    rel_variance = distance_variance / (avg_distance**2) if avg_distance > 0 else float('inf')
-    
-    # Проверка на круг для других случаев
+    # Проверка на круг для других случаев; центр и расстояния считаем,
+    # только если фигура в принципе может быть кругом
     if (is_closed and len(coordinates) > 10) or shape_type_hint == "polygon":
+        # Находим центр многоугольника (центр тяжести)
+        points = np.asarray(coordinates, dtype=np.float64)[:, :2]
+        center_lon, center_lat = points.mean(axis=0)
+        
+        # Вычисляем расстояние от центра до каждой точки
+        distances = np.hypot(points[:, 0] - center_lon, points[:, 1] - center_lat)
+        
+        # Если все расстояния примерно одинаковые, то фигура похожа на круг
+        avg_distance = distances.mean()
+        distance_variance = distances.var()
+        
+        # Относительная дисперсия (отклонение / среднее)
+        rel_variance = distance_variance / (avg_distance**2) if avg_distance > 0 else float('inf')
+        
         if rel_variance < 0.005:  # 0.5% для обычного Polygon
             radius_meters = avg_distance * 111000
             return "circle", (center_lat, center_lon, radius_meters)
@@ -116,24 +189,83 @@ def analyze_shape(coordinates, shape_type_hint=None):
         # Динамически подбираем шаг, чтобы получить примерно 8-12 точек
         target_points = 10
         step = max(1, len(coordinates) // target_points)
-        simple_coords = coordinates[::step]
+        indices = np.arange(0, len(coordinates), step)
         
         # Добавляем последнюю точку, если её еще нет и фигура замкнутая
-        if is_closed and simple_coords[-1] != coordinates[-1]:
-            simple_coords.append(coordinates[-1])
+        if is_closed and indices[-1] != len(coordinates) - 1:
+            indices = np.append(indices, len(coordinates) - 1)
+        
+        # Выбираем все нужные точки одной операцией
+        simple_coords = np.asarray(coordinates)[indices]
             
         return "complex_polygon" if is_closed else "path", simple_coords
     
     return "polygon" if is_closed else "path", coordinates
 
-def parse_kml_to_word(kml_file, output_file):
+def analyze_placemark(coordinates_text, shape_type_hint):
     """
-    Преобразует KML файл в документ Word с координатами в формате DMS
+    Разбирает строку координат зоны и анализирует её форму
+    Возвращает (количество точек, тип формы, данные формы)
+    или None, если координат нет
+    """
+    if coordinates_text is None:
+        return None
+    
+    # Преобразуем строку координат в массив (lon, lat, alt)
+    coordinates = parse_coordinates(coordinates_text)
+    
+    # Анализируем форму на основе координат с учетом подсказки типа
+    shape_type, shape_data = analyze_shape(coordinates, shape_type_hint)
+    return len(coordinates), shape_type, shape_data
+
+def iter_placemarks(kml_file):
+    """
+    Потоково перебирает Placemark из KML файла, не загружая весь документ.
+    Если в файле есть папка, берутся только Placemark из первой папки,
+    иначе — все Placemark документа.
+    Обработанные элементы удаляются из дерева для экономии памяти
+    """
+    folder = None
+    # Placemark, встреченные до первой папки: понадобятся, только если папок нет вовсе
+    pending = []
+    context = etree.iterparse(kml_file, events=('start', 'end'), tag=(FOLDER, PLACEMARK))
+    for event, elem in context:
+        if event == 'start':
+            # Запоминаем первую папку, в которой ищем зоны
+            if elem.tag == FOLDER and folder is None:
+                folder = elem
+                for placemark in pending:
+                    placemark.clear()
+                pending = []
+            continue
+        
+        if elem.tag != PLACEMARK:
+            continue
+        
+        if folder is None:
+            pending.append(elem)
+            continue
+        
+        if any(ancestor is folder for ancestor in elem.iterancestors(FOLDER)):
+            yield elem
+        
+        # Освобождаем память: очищаем элемент и удаляем уже пройденные соседние узлы
+        elem.clear()
+        while elem.getprevious() is not None:
+            del elem.getparent()[0]
+    
+    # Папок в файле нет — отдаем все накопленные Placemark
+    for placemark in pending:
+        yield placemark
+        placemark.clear()
+
+def parse_kml_to_word(kml_file, output_file, workers=1):
     """
-    # Разбор KML файла
-    tree = ET.parse(kml_file)
-    root = tree.getroot()
+    Преобразует KML файл в документ Word с координатами в формате DMS
     
+    workers: число процессов для анализа зон; по умолчанию (1)
+    зоны анализируются последовательно в текущем процессе
+    """
     # Создаем документ Word
     doc = Document()
     
@@ -153,68 +285,66 @@ def parse_kml_to_word(kml_file, output_file):
     # Создаем оглавление (простой список зон)
     doc.add_heading('Список зон:', level=1)
     
-    # Находим все Placemark в KML файле
-    ns = {'kml': 'http://www.opengis.net/kml/2.2'}
-    
-    # Находим все Placemark в папке
-    folder = root.find('.//kml:Folder', ns)
-    if folder is None:
-        folder = root  # Если нет папки, ищем во всем документе
+    # За один потоковый проход собираем имя, координаты и подсказку типа каждой зоны
+    zones = []
+    for placemark in iter_placemarks(kml_file):
+        name_elem = next(placemark.iter(NAME), None)
+        zone_name = name_elem.text if name_elem is not None else None
+        
+        # Получаем координаты
+        polygon = placemark.find(POLYGON_COORDS)
+        line_string = placemark.find(LINESTRING_COORDS)
+        
+        if polygon is not None:
+            coordinates_text = polygon.text
+            shape_type_hint = "polygon"
+        elif line_string is not None:
+            coordinates_text = line_string.text
+            shape_type_hint = "line"
+        else:
+            coordinates_text = None
+            shape_type_hint = None
         
-    placemarks = folder.findall('.//kml:Placemark', ns)
+        zones.append((zone_name, coordinates_text, shape_type_hint))
     
-    # Сначала собираем список всех зон для оглавления
-    for i, placemark in enumerate(placemarks, 1):
-        name_elem = placemark.find('.//kml:name', ns)
-        if name_elem is None or name_elem.text is None:
+    # Сначала выводим список всех зон для оглавления
+    for i, (zone_name, _, _) in enumerate(zones, 1):
+        if zone_name is None:
             continue
-        zone_name = name_elem.text
         doc.add_paragraph(f"{i}. {zone_name}", style='List Number')
     
     # Добавляем разделитель
     doc.add_page_break()
     
-    # Теперь обрабатываем каждую зону подробно
-    for placemark in placemarks:
-        # Извлекаем имя места
-        name_elem = placemark.find('.//kml:name', ns)
-        if name_elem is None or name_elem.text is None:
+    # Разбор координат и анализ формы зон независимы — по запросу выполняем их
+    # в нескольких процессах (запуск пула окупается только на больших файлах)
+    coordinates_texts = [coordinates_text for _, coordinates_text, _ in zones]
+    shape_type_hints = [shape_type_hint for _, _, shape_type_hint in zones]
+    if workers > 1:
+        chunksize = max(1, len(zones) // (workers * 4))
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            analyses = list(executor.map(analyze_placemark, coordinates_texts, shape_type_hints,
+                                         chunksize=chunksize))
+    else:
+        analyses = list(map(analyze_placemark, coordinates_texts, shape_type_hints))
+    
+    # Теперь обрабатываем каждую зону подробно (документ собираем последовательно)
+    last_zone_index = len(zones)
+    for zone_index, ((zone_name, _, _), analysis) in enumerate(zip(zones, analyses), 1):
+        if zone_name is None:
             continue
-            
-        zone_name = name_elem.text
         
         # Добавляем название зоны в документ
         heading = doc.add_heading(f'Зона: {zone_name}', level=1)
         
-        # Получаем координаты
-        polygon = placemark.find('.//kml:Polygon/kml:outerBoundaryIs/kml:LinearRing/kml:coordinates', ns)
-        line_string = placemark.find('.//kml:LineString/kml:coordinates', ns)
-        
-        if polygon is not None:
-            coordinates_text = polygon.text
-            shape_type_hint = "polygon"
-        elif line_string is not None:
-            coordinates_text = line_string.text
-            shape_type_hint = "line"
-        else:
+        if analysis is None:
             doc.add_paragraph('Координаты не найдены')
             continue
             
-        # Преобразуем строку координат в список кортежей (lon, lat, alt)
-        coordinates = []
-        for coord_str in coordinates_text.strip().split():
-            parts = coord_str.split(',')
-            if len(parts) >= 2:
-                lon = float(parts[0])
-                lat = float(parts[1])
-                alt = float(parts[2]) if len(parts) > 2 else 0
-                coordinates.append((lon, lat, alt))
-        
-        # Анализируем форму на основе координат с учетом подсказки типа
-        shape_type, shape_data = analyze_shape(coordinates, shape_type_hint)
+        point_count, shape_type, shape_data = analysis
         
         # Отладочная информация
-        print(f"Зона: {zone_name}, Тип: {shape_type}, Точек: {len(coordinates)}")
+        print(f"Зона: {zone_name}, Тип: {shape_type}, Точек: {point_count}")
         
         # Обрабатываем в зависимости от типа фигуры
         if shape_type == "circle":
@@ -238,54 +368,47 @@ def parse_kml_to_word(kml_file, output_file):
             p.add_run(f'{radius:.0f} м')
         
         else:
-            # Создаем таблицу для координат
-            table = doc.add_table(rows=1, cols=3)
+            # Создаем таблицу для координат (строки добавляются ниже из шаблонов)
+            table = doc.add_table(rows=0, cols=3)
             table.style = 'Table Grid'
             
-            # Заголовки таблицы
-            header_cells = table.rows[0].cells
-            header_cells[0].text = '№'
-            header_cells[1].text = 'Широта (DMS)'
-            header_cells[2].text = 'Долгота (DMS)'
-            
-            # Форматируем заголовок
-            for cell in header_cells:
-                cell.paragraphs[0].alignment = WD_ALIGN_PARAGRAPH.CENTER
-                for paragraph in cell.paragraphs:
-                    for run in paragraph.runs:
-                        run.bold = True
-            
             # Заполняем таблицу координатами
             coords_to_show = shape_data
             
-            for i, (lon, lat, _) in enumerate(coords_to_show, 1):
-                lat_dms = decimal_to_dms(lat, True)
-                lon_dms = decimal_to_dms(lon, False)
-                
-                row_cells = table.add_row().cells
-                row_cells[0].text = str(i)
-                row_cells[0].paragraphs[0].alignment = WD_ALIGN_PARAGRAPH.CENTER
-                row_cells[1].text = lat_dms
-                row_cells[1].paragraphs[0].alignment = WD_ALIGN_PARAGRAPH.CENTER
-                row_cells[2].text = lon_dms
-                row_cells[2].paragraphs[0].alignment = WD_ALIGN_PARAGRAPH.CENTER
+            # Собираем XML заголовка и всех строк сразу и добавляем их в таблицу одним вызовом
+            widths = [grid_col.get(qn('w:w')) for grid_col in table._tbl.tblGrid.gridCol_lst]
+            header_xml = COORD_HEADER_XML.format(widths[0], '№', widths[1], 'Широта (DMS)',
+                                                 widths[2], 'Долгота (DMS)')
+            rows_xml = header_xml + ''.join(
+                COORD_ROW_XML.format(widths[0], i,
+                                     widths[1], decimal_to_dms(lat, True),
+                                     widths[2], decimal_to_dms(lon, False))
+                for i, (lon, lat, _) in enumerate(coords_to_show, 1)
+            )
+            rows = parse_xml(f'<w:tbl {nsdecls("w")}>{rows_xml}</w:tbl>')
+            table._tbl.extend(list(rows))
         
         # Добавляем разделитель между зонами
         doc.add_paragraph('')
         
         # Если это не последняя зона, добавляем разрыв страницы
-        if placemark != placemarks[-1]:
+        if zone_index != last_zone_index:
             doc.add_page_break()
     
     # Сохраняем документ
     doc.save(output_file)
     print(f'Документ сохранен: {output_file}')
-    print(f'Всего зон обработано: {len(placemarks)}')
+    print(f'Всего зон обработано: {len(zones)}')
 
 if __name__ == "__main__":
     # Путь к KML файлу и выходному файлу Word
     kml_file = "amir_zones.kml"
     output_file = "zones_coordinates.docx"
     
+    # Необязательный аргумент: число процессов для анализа зон
+    # (по умолчанию 1 — без пула; пул окупается только на больших файлах),
+    # например: python kml_to_word.py 4
+    workers = int(sys.argv[1]) if len(sys.argv) > 1 else 1
+    
     # Конвертируем KML в Word
-    parse_kml_to_word(kml_file, output_file) 
\ No newline at end of file
+    parse_kml_to_word(kml_file, output_file, workers) 
\ No newline at end of file
@@ -5,15 +5,26 @@ import pandas as pd
 import json
 import sys
 
+try:
+    import orjson
+except ImportError:  # orjson не установлен — используем стандартный json
+    orjson = None
+
 def read_table(filename):
     """
     Попытка прочитать таблицу сначала как Excel (.xls),
     а при неудаче — как HTML с тегами <table>.
     """
-    try:
-        # Читаем как настоящий Excel
-        df = pd.read_excel(filename, engine='xlrd')
-    except Exception:
+    df = None
+    # Читаем как настоящий Excel: сначала быстрым calamine (Rust), затем xlrd
+    for engine in ('calamine', 'xlrd'):
+        try:
+            df = pd.read_excel(filename, engine=engine)
+            break
+        except Exception:
+            continue
+
+    if df is None:
         # Парсим HTML-таблицы
         tables = pd.read_html(filename, encoding='utf-8')
         if not tables:
@@ -39,16 +50,23 @@ def main():
             print(f"Error reading {fname}: {e}", file=sys.stderr)
             continue
 
-        # Добавляем источник и конвертируем строки в словари
-        for _, row in df.iterrows():
-            record = {col: (row[col] if pd.notnull(row[col]) else None) for col in df.columns}
+        # Заменяем пропуски на None и конвертируем строки в словари
+        df = df.astype(object).where(pd.notnull(df), None)
+        records = df.to_dict(orient='records')
+
+        # Добавляем источник
+        for record in records:
             record['source_file'] = fname
-            merged.append(record)
+        merged.extend(records)
 
     # Запись объединённого JSON
     out_path = 'zones.json'
-    with open(out_path, 'w', encoding='utf-8') as f:
-        json.dump(merged, f, ensure_ascii=False, indent=2)
+    if orjson is not None:
+        with open(out_path, 'wb') as f:
+            f.write(orjson.dumps(merged, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS))
+    else:
+        with open(out_path, 'w', encoding='utf-8') as f:
+            json.dump(merged, f, ensure_ascii=False, indent=2)
 
     print(f"Merged JSON saved to {out_path}")
 